@@ -0,0 +1,373 @@
+import json
+import os
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+from openai import OpenAI
+from backend_config import OPENAI_API_KEY
+from backend_evaluator import build_judge_request, parse_judge_response
+from backend_ragpipelines import PIPELINES, sync_pipelines
+from backend_vectorscore import RAGPipeline
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+# Batch API limits per input file
+MAX_BATCH_REQUESTS = 50_000
+MAX_BATCH_BYTES = 200 * 1024 * 1024
+
+# Statuses after which a batch will not make any more progress. Expired and
+# cancelled batches still have output for the requests that finished.
+FINISHED_STATUSES = {"completed", "expired", "cancelled"}
+FAILED_STATUSES = {"failed"}
+
+
+class BatchClient(ABC):
+    """
+    Minimal interface for submitting a JSONL batch file and reading back
+    its results. Result lines follow the OpenAI batch output format.
+    """
+
+    @abstractmethod
+    def submit(self, path: str) -> str:
+        ...
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        ...
+
+    @abstractmethod
+    def results(self, batch_id: str) -> List[Dict]:
+        ...
+
+
+class OpenAIBatchClient(BatchClient):
+    """
+    Runs batch files through the OpenAI Batch API (24h completion window).
+    """
+
+    def __init__(self):
+        self.client = OpenAI(api_key=OPENAI_API_KEY)
+
+    def submit(self, path: str) -> str:
+        with open(path, "rb") as f:
+            batch_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window="24h",
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> List[Dict]:
+        batch = self.client.batches.retrieve(batch_id)
+        lines = []
+        # Successful requests land in the output file, failed ones in the error file
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = self.client.files.content(file_id).text
+            lines.extend(json.loads(line) for line in content.splitlines() if line.strip())
+        return lines
+
+
+class LocalBatchClient(BatchClient):
+    """
+    In-process stand-in for the Batch API.
+    `responder` maps a chat completions request body to the reply text.
+    """
+
+    def __init__(self, responder: Callable[[Dict], str]):
+        self.responder = responder
+        self.batches: Dict[str, List[Dict]] = {}
+
+    def submit(self, path: str) -> str:
+        batch_id = f"batch_local_{uuid.uuid4().hex}"
+        lines = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                request = json.loads(line)
+                try:
+                    content = self.responder(request["body"])
+                    lines.append({
+                        "custom_id": request["custom_id"],
+                        "response": {
+                            "status_code": 200,
+                            "body": {"choices": [{"message": {"role": "assistant", "content": content}}]},
+                        },
+                        "error": None,
+                    })
+                except Exception as e:
+                    lines.append({
+                        "custom_id": request["custom_id"],
+                        "response": None,
+                        "error": {"message": str(e)},
+                    })
+        self.batches[batch_id] = lines
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        return "completed" if batch_id in self.batches else "failed"
+
+    def results(self, batch_id: str) -> List[Dict]:
+        return self.batches[batch_id]
+
+
+def write_batch_files(
+    path_prefix: str,
+    requests: Dict[str, Dict],
+    max_requests: int = MAX_BATCH_REQUESTS,
+    max_bytes: int = MAX_BATCH_BYTES,
+) -> List[str]:
+    """
+    Write {custom_id: request body} as JSONL files in the OpenAI batch format,
+    starting a new file whenever the next line would exceed the per-file limits.
+    Returns the paths written, named <path_prefix>_<part>.jsonl.
+    """
+    parts: List[List[str]] = []
+    part_bytes = 0
+    for custom_id, body in requests.items():
+        line = json.dumps({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": body,
+        }) + "\n"
+        line_bytes = len(line.encode("utf-8"))
+        if not parts or len(parts[-1]) >= max_requests or part_bytes + line_bytes > max_bytes:
+            parts.append([])
+            part_bytes = 0
+        parts[-1].append(line)
+        part_bytes += line_bytes
+
+    paths = []
+    for part_idx, lines in enumerate(parts):
+        path = f"{path_prefix}_{part_idx:03d}.jsonl"
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        paths.append(path)
+    return paths
+
+
+def read_batch_result(line: Dict) -> str:
+    """
+    Extract the reply text from one batch output line.
+    Raises RuntimeError if the request failed.
+    """
+    response = line.get("response") or {}
+    if line.get("error") or response.get("status_code") != 200:
+        error = line.get("error") or response.get("body", {}).get("error") or {}
+        raise RuntimeError(error.get("message", "batch request failed"))
+    return response["body"]["choices"][0]["message"]["content"]
+
+
+def wait_for_batches(
+    client: BatchClient,
+    batch_ids: List[str],
+    poll_interval: float = 30.0,
+    timeout: Optional[float] = None,
+) -> Dict[str, Dict]:
+    """
+    Poll the given batches until all have finished.
+    Returns their output lines merged and keyed by custom_id. Expired or
+    cancelled batches contribute whatever lines they finished.
+    Can be pointed at the ids in a run's *_batches.json to collect results
+    after the submitting process has gone away.
+    """
+    pending = list(batch_ids)
+    started = time.time()
+    while True:
+        still_pending = []
+        for batch_id in pending:
+            status = client.status(batch_id)
+            if status in FAILED_STATUSES:
+                raise RuntimeError(f"Batch {batch_id} ended with status '{status}'")
+            if status not in FINISHED_STATUSES:
+                still_pending.append(batch_id)
+            elif status != "completed":
+                print(f"Warning: batch {batch_id} {status}, collecting partial results")
+        pending = still_pending
+        if not pending:
+            break
+        if timeout is not None and time.time() - started > timeout:
+            raise TimeoutError(f"Batches {pending} still running after {timeout}s")
+        time.sleep(poll_interval)
+
+    lines = {}
+    for batch_id in batch_ids:
+        for line in client.results(batch_id):
+            lines[line["custom_id"]] = line
+    return lines
+
+
+def run_batch(
+    client: BatchClient,
+    path_prefix: str,
+    requests: Dict[str, Dict],
+    poll_interval: float = 30.0,
+    timeout: Optional[float] = None,
+    max_requests: int = MAX_BATCH_REQUESTS,
+    max_bytes: int = MAX_BATCH_BYTES,
+) -> Dict[str, Dict]:
+    """
+    Write, submit and poll one or more batches until they complete.
+    Submitted batch ids are recorded in <path_prefix>_batches.json as they go out.
+    Returns the output lines keyed by custom_id.
+    """
+    paths = write_batch_files(path_prefix, requests, max_requests=max_requests, max_bytes=max_bytes)
+
+    manifest_path = f"{path_prefix}_batches.json"
+    submitted = []
+    for path in paths:
+        batch_id = client.submit(path)
+        submitted.append({"path": path, "batch_id": batch_id})
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(submitted, f, indent=2)
+        print(f"Submitted batch {batch_id} ({path})")
+    print(f"Submitted {len(requests)} requests in {len(paths)} batches, ids saved to {manifest_path}")
+
+    return wait_for_batches(
+        client,
+        [entry["batch_id"] for entry in submitted],
+        poll_interval=poll_interval,
+        timeout=timeout,
+    )
+
+
+def run_offline_benchmark(
+    questions: List[str],
+    client: BatchClient,
+    pipelines: Optional[List[RAGPipeline]] = None,
+    batch_dir: str = "./batch_jobs",
+    poll_interval: float = 30.0,
+    timeout: Optional[float] = None,
+) -> List[Dict]:
+    """
+    Answer and judge every question using batch jobs instead of
+    per-request chat completions.
+    Retrieval still runs locally; generation goes out as one set of batches
+    and judging as a second one, since the judge needs the answers.
+    Returns one {"question", "pipelines", "evaluation"} entry per question,
+    the same shape as the /ask response.
+    """
+    if pipelines is None:
+        sync_pipelines()
+        pipelines = PIPELINES
+    os.makedirs(batch_dir, exist_ok=True)
+    run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+    # Retrieve context and queue generation requests
+    outputs: List[List[Dict]] = []
+    generation_requests = {}
+    for q_idx, question in enumerate(questions):
+        question_outputs = []
+        for p in pipelines:
+            try:
+                result = p.retrieve(question)
+                if result["answer"] is None:
+                    generation_requests[f"gen-{q_idx}-{p.pipeline_id}"] = p.build_chat_request(
+                        question, result["context"]
+                    )
+            except Exception as e:
+                result = p.error_result(e)
+            question_outputs.append(result)
+        outputs.append(question_outputs)
+
+    if generation_requests:
+        lines = run_batch(
+            client,
+            os.path.join(batch_dir, f"{run_id}_generation"),
+            generation_requests,
+            poll_interval=poll_interval,
+            timeout=timeout,
+        )
+        for q_idx, question_outputs in enumerate(outputs):
+            for p_idx, p in enumerate(pipelines):
+                custom_id = f"gen-{q_idx}-{p.pipeline_id}"
+                if custom_id not in generation_requests:
+                    continue
+                try:
+                    if custom_id not in lines:
+                        raise RuntimeError("missing from batch output")
+                    question_outputs[p_idx]["answer"] = read_batch_result(lines[custom_id])
+                except Exception as e:
+                    question_outputs[p_idx] = p.error_result(e)
+
+    # Judge all answers for each question
+    judge_requests = {
+        f"judge-{q_idx}": build_judge_request(question, outputs[q_idx])
+        for q_idx, question in enumerate(questions)
+    }
+    evaluations: Dict[str, Dict] = {}
+    if judge_requests:
+        lines = run_batch(
+            client,
+            os.path.join(batch_dir, f"{run_id}_judge"),
+            judge_requests,
+            poll_interval=poll_interval,
+            timeout=timeout,
+        )
+        for custom_id in judge_requests:
+            try:
+                if custom_id not in lines:
+                    raise RuntimeError("missing from batch output")
+                evaluations[custom_id] = parse_judge_response(read_batch_result(lines[custom_id]))
+            except Exception as e:
+                evaluations[custom_id] = {"error": str(e)}
+
+    return [
+        {
+            "question": question,
+            "pipelines": outputs[q_idx],
+            "evaluation": evaluations[f"judge-{q_idx}"],
+        }
+        for q_idx, question in enumerate(questions)
+    ]
+
+
+if __name__ == "__main__":
+    import argparse
+    from backend_ingestion import pdf_bytes_to_text, merge_texts
+    from backend_ragpipelines import build_pipelines
+
+    parser = argparse.ArgumentParser(description="Run an offline batch benchmark over a question set.")
+    parser.add_argument("--docs", nargs="+", required=True, help="PDF or text files to index")
+    parser.add_argument("--questions", required=True, help="Text file with one question per line")
+    parser.add_argument("--output", default="batch_results.json", help="Where to write the results")
+    parser.add_argument("--batch-dir", default="./batch_jobs", help="Where to write batch JSONL files")
+    parser.add_argument("--poll-interval", type=float, default=30.0, help="Seconds between status checks")
+    args = parser.parse_args()
+
+    texts = []
+    for path in args.docs:
+        with open(path, "rb") as f:
+            content = f.read()
+        if path.lower().endswith(".pdf"):
+            texts.append(pdf_bytes_to_text(content))
+        else:
+            texts.append(content.decode("utf-8", errors="ignore"))
+    # Index into private in-process pipelines, never into the shared store
+    # that serving workers read from
+    pipelines = build_pipelines()
+    for p in pipelines:
+        p.index_documents([merge_texts(texts)])
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+
+    results = run_offline_benchmark(
+        questions,
+        OpenAIBatchClient(),
+        pipelines=pipelines,
+        batch_dir=args.batch_dir,
+        poll_interval=args.poll_interval,
+    )
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote results for {len(questions)} questions to {args.output}")
@@ -7,3 +7,7 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
 if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY not set in .env")
+
+# When set, indexes live in versioned directories under this path so that
+# several uvicorn workers can share them (see backend_sharedindex.py)
+SHARED_INDEX_DIR = os.getenv("RAG_SHARED_INDEX_DIR")
@@ -7,10 +7,9 @@ from backend_config import OPENAI_API_KEY
 client = OpenAI(api_key=OPENAI_API_KEY)
 
 
-def evaluate_pipelines(question: str, pipeline_outputs: List[Dict]) -> Dict:
+def build_judge_request(question: str, pipeline_outputs: List[Dict]) -> Dict:
     """
-    Use GPT-4o as a judge to rate each pipeline answer.
-    Returns structured JSON with scores + winner.
+    Build the chat completions request body for the GPT-4o judge.
     """
     # Build a compact description for the judge
     answers_block = []
@@ -47,13 +46,17 @@ Answers:
 {answers_text}
 """
 
-    completion = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": prompt}],
-        response_format={"type": "json_object"},
-    )
+    return {
+        "model": "gpt-4o",
+        "messages": [{"role": "user", "content": prompt}],
+        "response_format": {"type": "json_object"},
+    }
 
-    content = completion.choices[0].message.content
+
+def parse_judge_response(content: str) -> Dict:
+    """
+    Parse the judge's JSON reply into scores + winner.
+    """
     try:
         data = json.loads(content)
     except json.JSONDecodeError:
@@ -61,3 +64,15 @@ Answers:
         data = {"raw": content}
 
     return data
+
+
+def evaluate_pipelines(question: str, pipeline_outputs: List[Dict]) -> Dict:
+    """
+    Use GPT-4o as a judge to rate each pipeline answer.
+    Returns structured JSON with scores + winner.
+    """
+    completion = client.chat.completions.create(
+        **build_judge_request(question, pipeline_outputs)
+    )
+
+    return parse_judge_response(completion.choices[0].message.content)
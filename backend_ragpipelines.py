@@ -1,47 +1,198 @@
-from typing import List
+from typing import IO, List, Optional
+import chromadb
+from chromadb.api.client import SharedSystemClient
+from chromadb.config import Settings
+from backend_config import SHARED_INDEX_DIR
 from backend_vectorscore import RAGPipeline
+import backend_sharedindex as shared_index
 
-# We use different combinations of chunk size & embedding model
-PIPELINES: List[RAGPipeline] = [
-    RAGPipeline(
-        pipeline_id="A",
-        description="Chunk=256, Embedding=text-embedding-3-small",
-        chunk_size=256,
-        embedding_model="text-embedding-3-small",
-    ),
-    RAGPipeline(
-        pipeline_id="B",
-        description="Chunk=512, Embedding=text-embedding-3-large",
-        chunk_size=512,
-        embedding_model="text-embedding-3-large",
-    ),
-    RAGPipeline(
-        pipeline_id="C",
-        description="Chunk=1024, Embedding=text-embedding-3-small",
-        chunk_size=1024,
-        embedding_model="text-embedding-3-small",
-    ),
-    RAGPipeline(
-        pipeline_id="D",
-        description="Chunk=512, Embedding=text-embedding-3-large (alt)",
-        chunk_size=512,
-        embedding_model="text-embedding-3-large",
-    ),
-]
+
+def build_pipelines() -> List[RAGPipeline]:
+    """
+    Create the pipelines, each with its own in-process Chroma collection.
+    """
+    # We use different combinations of chunk size & embedding model
+    return [
+        RAGPipeline(
+            pipeline_id="A",
+            description="Chunk=256, Embedding=text-embedding-3-small",
+            chunk_size=256,
+            embedding_model="text-embedding-3-small",
+        ),
+        RAGPipeline(
+            pipeline_id="B",
+            description="Chunk=512, Embedding=text-embedding-3-large",
+            chunk_size=512,
+            embedding_model="text-embedding-3-large",
+        ),
+        RAGPipeline(
+            pipeline_id="C",
+            description="Chunk=1024, Embedding=text-embedding-3-small",
+            chunk_size=1024,
+            embedding_model="text-embedding-3-small",
+        ),
+        RAGPipeline(
+            pipeline_id="D",
+            description="Chunk=512, Embedding=text-embedding-3-large (alt)",
+            chunk_size=512,
+            embedding_model="text-embedding-3-large",
+        ),
+    ]
+
+
+PIPELINES: List[RAGPipeline] = build_pipelines()
+
+
+# Shared index version the PIPELINES are currently attached to, and the
+# lease that keeps other workers from pruning it (shared mode only)
+_attached_version: Optional[int] = None
+_attached_lease: Optional[IO] = None
+# Published version that could not be opened, so sync doesn't retry it per request
+_broken_version: Optional[int] = None
+
+
+def _close_clients():
+    # Chroma caches one system per path for the life of the process; stop
+    # them so the SQLite handles and HNSW indexes of old versions are freed.
+    # Requests are handled one at a time per worker, so nothing is mid-query.
+    SharedSystemClient.clear_system_cache()
+
+
+def _open_shared_index(version: int):
+    return chromadb.PersistentClient(
+        path=shared_index.version_dir(SHARED_INDEX_DIR, version),
+        settings=Settings(anonymized_telemetry=False),
+    )
+
+
+def _open_and_attach(version: int):
+    _close_clients()
+    client = _open_shared_index(version)
+    for p in PIPELINES:
+        p.attach(client, read_only=True)
+
+
+def _attach_shared(version: int) -> bool:
+    """
+    Attach PIPELINES read-only to a published version.
+    Returns False if that version was pruned before we could lease it.
+    If it cannot be opened, falls back to the previous attachment and re-raises.
+    """
+    global _attached_version, _attached_lease
+    lease = shared_index.acquire_lease(SHARED_INDEX_DIR, version)
+    if lease is None:
+        return False
+
+    try:
+        _open_and_attach(version)
+    except Exception:
+        shared_index.release_lease(lease)
+        _fall_back()
+        raise
+
+    shared_index.release_lease(_attached_lease)
+    _attached_version = version
+    _attached_lease = lease
+    return True
+
+
+def _attach_empty():
+    """
+    Attach PIPELINES to an empty in-process index (nothing published yet).
+    """
+    global _attached_version, _attached_lease
+    _close_clients()
+    client = chromadb.Client(Settings(anonymized_telemetry=False))
+    for p in PIPELINES:
+        p.attach(client)
+
+    shared_index.release_lease(_attached_lease)
+    _attached_version = None
+    _attached_lease = None
+
+
+def _fall_back():
+    """
+    Reattach PIPELINES to the version we still hold a lease on, or to an
+    empty index if there is none or it cannot be opened either.
+    """
+    if _attached_version is not None:
+        try:
+            _open_and_attach(_attached_version)
+            return
+        except Exception as e:
+            print(f"Error reattaching to shared index version {_attached_version}: {e}")
+    _attach_empty()
+
+
+def sync_pipelines():
+    """
+    In shared mode, reattach to the latest published index version if another
+    worker has uploaded since we last looked. No-op otherwise.
+    """
+    global _broken_version
+    if not SHARED_INDEX_DIR:
+        return
+
+    while True:
+        version = shared_index.read_version(SHARED_INDEX_DIR)
+        if version == 0 or version in (_attached_version, _broken_version):
+            return
+        try:
+            attached = _attach_shared(version)
+        except Exception as e:
+            # Keep serving what we fell back to until a newer version is published
+            print(f"Error attaching to shared index version {version}: {e}")
+            _broken_version = version
+            return
+        # A newer upload can prune the version we just read; look again
+        if attached:
+            print(f"Attached to shared index version {version}")
+            return
 
 
 def index_all_pipelines(raw_texts: List[str]):
     """
     Index the same documents into each pipeline with its own strategy.
+    In shared mode, build a new index version and publish it for all workers.
     """
-    for p in PIPELINES:
-        p.index_documents(raw_texts)
+    if not SHARED_INDEX_DIR:
+        for p in PIPELINES:
+            p.index_documents(raw_texts)
+        return
+
+    with shared_index.write_lock(SHARED_INDEX_DIR):
+        published = shared_index.read_version(SHARED_INDEX_DIR)
+        version = published + 1
+        try:
+            _close_clients()
+            client = _open_shared_index(version)
+            for p in PIPELINES:
+                p.attach(client)
+                p.index_documents(raw_texts)
+        except Exception:
+            # Never leave a half-built index attached or on disk
+            _close_clients()
+            try:
+                shared_index.remove_version(SHARED_INDEX_DIR, version)
+            except OSError as e:
+                print(f"Warning: could not remove unpublished index version {version}: {e}")
+            # Still leased, so the version we were attached to can't be pruned
+            _fall_back()
+            raise
+
+        shared_index.publish_version(SHARED_INDEX_DIR, version)
+        # Falls back to the previous version and re-raises if v<N> can't be reopened
+        _attach_shared(version)
+        pruned = shared_index.prune_versions(SHARED_INDEX_DIR, current=version)
+    print(f"Published shared index version {version} (pruned {pruned or 'none'})")
 
 
 def run_all_pipelines(question: str):
     """
     Run all pipelines and collect their answers.
     """
+    sync_pipelines()
     results = []
     for p in PIPELINES:
         res = p.answer(question)
@@ -0,0 +1,123 @@
+import fcntl
+import os
+import shutil
+from contextlib import contextmanager
+from typing import IO, List, Optional
+
+# Each upload builds a fresh index under <index_dir>/v<N>, then publishes N
+# to the VERSION file. Workers compare VERSION with what they are attached to
+# and reopen the newer directory, so a half-built index is never visible.
+#
+# A worker attached to v<N> holds a shared flock on <index_dir>/v<N>.lock
+# (its "lease"). Old versions are only deleted once the pruner can take that
+# lock exclusively, i.e. once no worker has the directory open any more.
+VERSION_FILE = "VERSION"
+LOCK_FILE = "index.lock"
+
+
+def version_dir(index_dir: str, version: int) -> str:
+    return os.path.join(index_dir, f"v{version}")
+
+
+def _lease_path(index_dir: str, version: int) -> str:
+    return os.path.join(index_dir, f"v{version}.lock")
+
+
+def read_version(index_dir: str) -> int:
+    """
+    Return the latest published index version, or 0 if nothing is published yet.
+    """
+    try:
+        with open(os.path.join(index_dir, VERSION_FILE), "r") as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def publish_version(index_dir: str, version: int):
+    """
+    Atomically point readers at a fully built index version.
+    """
+    tmp_path = os.path.join(index_dir, f"{VERSION_FILE}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(str(version))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(index_dir, VERSION_FILE))
+
+
+def acquire_lease(index_dir: str, version: int) -> Optional[IO]:
+    """
+    Take a shared lease on an index version before opening it.
+    Returns None if the version has already been pruned.
+    """
+    lease = open(_lease_path(index_dir, version), "a")
+    fcntl.flock(lease, fcntl.LOCK_SH)
+    # The pruner deletes the directory while holding the lock exclusively,
+    # so once we hold it shared the directory can no longer disappear
+    if not os.path.isdir(version_dir(index_dir, version)):
+        lease.close()
+        return None
+    return lease
+
+
+def release_lease(lease: Optional[IO]):
+    if lease is not None:
+        lease.close()
+
+
+def _existing_versions(index_dir: str) -> List[int]:
+    versions = set()
+    for name in os.listdir(index_dir):
+        stem = name[:-len(".lock")] if name.endswith(".lock") else name
+        if stem.startswith("v") and stem[1:].isdigit():
+            versions.add(int(stem[1:]))
+    return sorted(versions)
+
+
+def remove_version(index_dir: str, version: int):
+    """
+    Delete an index version's directory. Callers must ensure nobody holds a lease on it.
+    """
+    path = version_dir(index_dir, version)
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+
+
+def prune_versions(index_dir: str, current: int) -> List[int]:
+    """
+    Delete versions older than current that no worker holds a lease on.
+    Leased versions are left for a later prune. Returns the versions deleted.
+    """
+    pruned = []
+    for version in _existing_versions(index_dir):
+        if version >= current:
+            continue
+        lease_path = _lease_path(index_dir, version)
+        with open(lease_path, "a") as lease:
+            try:
+                fcntl.flock(lease, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue
+            try:
+                remove_version(index_dir, version)
+            except OSError as e:
+                print(f"Warning: could not remove shared index version {version}: {e}")
+                continue
+            os.remove(lease_path)
+        pruned.append(version)
+    return pruned
+
+
+@contextmanager
+def write_lock(index_dir: str):
+    """
+    Serialize uploads across worker processes.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, LOCK_FILE), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -1,4 +1,4 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 import chromadb
 from chromadb.config import Settings
 from chromadb.utils import embedding_functions
@@ -45,22 +45,37 @@ class RAGPipeline:
         self.chunk_size = chunk_size
         self.embedding_model = embedding_model
 
-        self.client = chromadb.Client(
-            Settings(
-                anonymized_telemetry=False,
-                persist_directory=persist_directory,
-            )
-        )
-
-        embedding_fn = OpenAIEmbeddingFn(model_name=self.embedding_model)
+        self.embedding_fn = OpenAIEmbeddingFn(model_name=self.embedding_model)
 
-        self.collection = self.client.get_or_create_collection(
-            name=f"pipeline_{self.pipeline_id}",
-            embedding_function=embedding_fn,
+        self.attach(
+            chromadb.Client(
+                Settings(
+                    anonymized_telemetry=False,
+                    persist_directory=persist_directory,
+                )
+            )
         )
 
         self.llm_client = OpenAI(api_key=OPENAI_API_KEY)
 
+    def attach(self, client, read_only: bool = False):
+        """
+        Point this pipeline at the collection held by the given Chroma client
+        (e.g. a newly published shared index version).
+        With read_only, the collection must already exist and is never created.
+        """
+        self.client = client
+        if read_only:
+            self.collection = self.client.get_collection(
+                name=f"pipeline_{self.pipeline_id}",
+                embedding_function=self.embedding_fn,
+            )
+        else:
+            self.collection = self.client.get_or_create_collection(
+                name=f"pipeline_{self.pipeline_id}",
+                embedding_function=self.embedding_fn,
+            )
+
     def clear(self):
         # Get all IDs and delete them, or delete all by getting all results
         try:
@@ -115,70 +130,82 @@ class RAGPipeline:
         else:
             print(f"Warning: No documents to index for pipeline {self.pipeline_id}")
 
-    def answer(self, question: str, top_k: int = 4) -> Dict:
+    def _result(self, answer: Optional[str], context: str = "") -> Dict:
+        return {
+            "pipeline_id": self.pipeline_id,
+            "description": self.description,
+            "answer": answer,
+            "context": context,
+        }
+
+    def retrieve(self, question: str, top_k: int = 4) -> Dict:
         """
-        Retrieve top_k chunks and generate answer using GPT-4o-mini.
-        Return answer + retrieved context.
+        Retrieve top_k chunks for the question.
+        Returns the pipeline output with "answer" set to None when generation
+        is still needed, or to a user-facing message when it can be skipped.
         """
         # Check if collection has documents
         try:
             doc_count = self.collection.count()
             if doc_count == 0:
-                return {
-                    "pipeline_id": self.pipeline_id,
-                    "description": self.description,
-                    "answer": "No documents indexed. Please upload documents first.",
-                    "context": "",
-                }
+                return self._result("No documents indexed. Please upload documents first.")
         except Exception as e:
             print(f"Error checking collection count: {e}")
-        
-        try:
-            results = self.collection.query(
-                query_texts=[question],
-                n_results=top_k,
-            )
 
-            docs = results["documents"][0] if results["documents"] and len(results["documents"]) > 0 else []
-            context = "\n\n".join(docs) if docs else ""
-            
-            # If no context retrieved, return early
-            if not context or context.strip() == "":
-                return {
-                    "pipeline_id": self.pipeline_id,
-                    "description": self.description,
-                    "answer": "No relevant context found in the documents. Please try a different question or ensure documents are properly indexed.",
-                    "context": "",
-                }
-
-            prompt = (
-                "You are a helpful assistant answering questions based on the provided context.\n"
-                "Use the context below to answer the question. If the context contains relevant information, provide a detailed answer.\n"
-                "If the context doesn't contain enough information to fully answer the question, provide the best answer you can based on what is available.\n"
-                "Only say 'I am not sure' if the context is completely irrelevant or empty.\n\n"
-                f"Context:\n{context}\n\nQuestion: {question}\n\nAnswer:"
+        results = self.collection.query(
+            query_texts=[question],
+            n_results=top_k,
+        )
+
+        docs = results["documents"][0] if results["documents"] and len(results["documents"]) > 0 else []
+        context = "\n\n".join(docs) if docs else ""
+
+        # If no context retrieved, there is nothing to generate from
+        if not context or context.strip() == "":
+            return self._result(
+                "No relevant context found in the documents. Please try a different question or ensure documents are properly indexed."
             )
 
+        return self._result(None, context)
+
+    def build_chat_request(self, question: str, context: str) -> Dict:
+        """
+        Build the chat completions request body used to generate an answer.
+        """
+        prompt = (
+            "You are a helpful assistant answering questions based on the provided context.\n"
+            "Use the context below to answer the question. If the context contains relevant information, provide a detailed answer.\n"
+            "If the context doesn't contain enough information to fully answer the question, provide the best answer you can based on what is available.\n"
+            "Only say 'I am not sure' if the context is completely irrelevant or empty.\n\n"
+            f"Context:\n{context}\n\nQuestion: {question}\n\nAnswer:"
+        )
+        return {
+            "model": "gpt-4o-mini",
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.3,
+        }
+
+    def error_result(self, error: Exception) -> Dict:
+        import traceback
+        error_msg = f"Error in pipeline {self.pipeline_id}: {str(error)}"
+        print(f"{error_msg}\n{traceback.format_exc()}")
+        return self._result(f"Error: {error_msg}")
+
+    def answer(self, question: str, top_k: int = 4) -> Dict:
+        """
+        Retrieve top_k chunks and generate answer using GPT-4o-mini.
+        Return answer + retrieved context.
+        """
+        try:
+            result = self.retrieve(question, top_k=top_k)
+            if result["answer"] is not None:
+                return result
+
             completion = self.llm_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
+                **self.build_chat_request(question, result["context"])
             )
 
-            answer_text = completion.choices[0].message.content
-            return {
-                "pipeline_id": self.pipeline_id,
-                "description": self.description,
-                "answer": answer_text,
-                "context": context,
-            }
+            result["answer"] = completion.choices[0].message.content
+            return result
         except Exception as e:
-            import traceback
-            error_msg = f"Error in pipeline {self.pipeline_id}: {str(e)}"
-            print(f"{error_msg}\n{traceback.format_exc()}")
-            return {
-                "pipeline_id": self.pipeline_id,
-                "description": self.description,
-                "answer": f"Error: {error_msg}",
-                "context": "",
-            }
+            return self.error_result(e)
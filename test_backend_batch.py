@@ -0,0 +1,147 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("openai")
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from backend_batch import LocalBatchClient, run_batch, run_offline_benchmark, write_batch_files  # noqa: E402
+from backend_vectorscore import RAGPipeline  # noqa: E402
+
+
+class FakePipeline(RAGPipeline):
+    """
+    RAGPipeline with canned retrieval, so no Chroma collection or embeddings are needed.
+    """
+
+    def __init__(self, pipeline_id: str):
+        self.pipeline_id = pipeline_id
+        self.description = f"fake {pipeline_id}"
+
+    def retrieve(self, question: str, top_k: int = 4):
+        return self._result(None, f"context for {question}")
+
+
+class DroppingBatchClient(LocalBatchClient):
+    """
+    Local client whose output is missing one custom_id, as if the batch lost it.
+    """
+
+    def __init__(self, responder, dropped_id: str):
+        super().__init__(responder)
+        self.dropped_id = dropped_id
+
+    def results(self, batch_id):
+        return [line for line in super().results(batch_id) if line["custom_id"] != self.dropped_id]
+
+
+class ExpiringBatchClient(LocalBatchClient):
+    """
+    Local client whose second batch expires after finishing only its first request.
+    """
+
+    def __init__(self, responder):
+        super().__init__(responder)
+        self.expired_id = None
+
+    def submit(self, path):
+        batch_id = super().submit(path)
+        if len(self.batches) == 2:
+            self.expired_id = batch_id
+            self.batches[batch_id] = self.batches[batch_id][:1]
+        return batch_id
+
+    def status(self, batch_id):
+        return "expired" if batch_id == self.expired_id else super().status(batch_id)
+
+
+def responder(body):
+    prompt = body["messages"][0]["content"]
+    if body["model"] == "gpt-4o":
+        return json.dumps({"winner": "B"})
+    if "Question: q1" in prompt:
+        raise ValueError("rate limited")
+    question = prompt.split("Question: ")[1].split("\n")[0]
+    return f"answer to {question}"
+
+
+def test_run_offline_benchmark_joins_results(tmp_path):
+    pipelines = [FakePipeline("A"), FakePipeline("B")]
+    client = DroppingBatchClient(responder, dropped_id="gen-2-B")
+
+    results = run_offline_benchmark(
+        ["q0", "q1", "q2"],
+        client,
+        pipelines=pipelines,
+        batch_dir=str(tmp_path),
+        poll_interval=0,
+    )
+
+    assert [r["question"] for r in results] == ["q0", "q1", "q2"]
+
+    # Success path: answers land on the right question and pipeline
+    q0 = results[0]["pipelines"]
+    assert [p["pipeline_id"] for p in q0] == ["A", "B"]
+    assert [p["answer"] for p in q0] == ["answer to q0", "answer to q0"]
+    assert q0[0]["context"] == "context for q0"
+    assert results[0]["evaluation"] == {"winner": "B"}
+
+    # Per-request failure matches what /ask returns for a failed pipeline
+    for p in results[1]["pipelines"]:
+        assert p["answer"] == f"Error: Error in pipeline {p['pipeline_id']}: rate limited"
+        assert p["context"] == ""
+
+    # Missing custom_id only affects that one pipeline
+    q2 = results[2]["pipelines"]
+    assert q2[0]["answer"] == "answer to q2"
+    assert q2[1]["answer"] == "Error: Error in pipeline B: missing from batch output"
+
+    # Batch ids are saved next to the JSONL files
+    manifests = sorted(name for name in os.listdir(tmp_path) if name.endswith("_batches.json"))
+    assert len(manifests) == 2
+    for name in manifests:
+        with open(tmp_path / name) as f:
+            assert all(entry["batch_id"] in client.batches for entry in json.load(f))
+
+
+def test_write_batch_files_splits_on_limits(tmp_path):
+    requests = {f"req-{i}": {"model": "gpt-4o-mini", "messages": []} for i in range(5)}
+
+    paths = write_batch_files(str(tmp_path / "run"), requests, max_requests=2)
+    assert len(paths) == 3
+
+    line_bytes = os.path.getsize(paths[0]) // 2
+    paths = write_batch_files(str(tmp_path / "bytes"), requests, max_bytes=line_bytes * 3)
+    assert len(paths) == 2
+
+    custom_ids = []
+    for path in paths:
+        with open(path) as f:
+            custom_ids.extend(json.loads(line)["custom_id"] for line in f)
+    assert custom_ids == list(requests)
+
+
+def test_run_batch_keeps_partial_results_of_expired_batch(tmp_path):
+    requests = {
+        f"gen-{i}-A": {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": f"Question: q{i}\n"}]}
+        for i in range(4)
+    }
+    client = ExpiringBatchClient(responder)
+
+    lines = run_batch(client, str(tmp_path / "run"), requests, poll_interval=0, max_requests=2)
+
+    # First part completed, second part expired after one request
+    assert len(client.batches) == 2
+    assert sorted(lines) == ["gen-0-A", "gen-1-A", "gen-2-A"]
+
+
+def test_run_batch_raises_on_failed_batch(tmp_path):
+    class FailingBatchClient(LocalBatchClient):
+        def status(self, batch_id):
+            return "failed"
+
+    requests = {"gen-0-A": {"model": "gpt-4o-mini", "messages": []}}
+    with pytest.raises(RuntimeError, match="failed"):
+        run_batch(FailingBatchClient(responder), str(tmp_path / "run"), requests, poll_interval=0)
@@ -0,0 +1,161 @@
+import fcntl
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("openai")
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+import backend_ragpipelines as ragpipelines  # noqa: E402
+import backend_sharedindex as shared_index  # noqa: E402
+from backend_vectorscore import OpenAIEmbeddingFn, RAGPipeline  # noqa: E402
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DOC_V1 = "Cats are small domesticated carnivorous mammals. " * 40
+DOC_V2 = "Dogs were the first species to be domesticated by humans. " * 40
+
+
+def fake_embed(self, input):
+    # Deterministic stand-in for OpenAI embeddings; Chroma passes input=...
+    return [[float(len(t)), float(sum(map(ord, t)) % 997), 1.0] for t in input]
+
+
+# A second worker process that only syncs and reports what it sees
+WORKER_SCRIPT = """
+import json
+import backend_ragpipelines
+from backend_vectorscore import OpenAIEmbeddingFn
+from test_backend_ragpipelines import fake_embed
+OpenAIEmbeddingFn.__call__ = fake_embed
+backend_ragpipelines.sync_pipelines()
+print(json.dumps({
+    "version": backend_ragpipelines._attached_version,
+    "counts": [p.collection.count() for p in backend_ragpipelines.PIPELINES],
+}))
+"""
+
+
+@pytest.fixture
+def shared_dir(tmp_path, monkeypatch):
+    index_dir = str(tmp_path / "index")
+    monkeypatch.setattr(OpenAIEmbeddingFn, "__call__", fake_embed)
+    monkeypatch.setattr(ragpipelines, "SHARED_INDEX_DIR", index_dir)
+    monkeypatch.setattr(ragpipelines, "_attached_version", None)
+    monkeypatch.setattr(ragpipelines, "_attached_lease", None)
+    monkeypatch.setattr(ragpipelines, "_broken_version", None)
+    yield index_dir
+    ragpipelines._attach_empty()
+
+
+def counts():
+    return [p.collection.count() for p in ragpipelines.PIPELINES]
+
+
+def test_upload_is_visible_to_other_worker(shared_dir):
+    ragpipelines.index_all_pipelines([DOC_V1])
+    assert shared_index.read_version(shared_dir) == 1
+    uploaded_counts = counts()
+    assert all(count > 0 for count in uploaded_counts)
+
+    env = dict(os.environ, RAG_SHARED_INDEX_DIR=shared_dir, OPENAI_API_KEY="test-key")
+    worker = subprocess.run(
+        [sys.executable, "-c", WORKER_SCRIPT],
+        cwd=REPO_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    seen = json.loads(worker.stdout.strip().splitlines()[-1])
+    assert seen == {"version": 1, "counts": uploaded_counts}
+
+
+def test_sync_attaches_to_newer_version(shared_dir):
+    ragpipelines.index_all_pipelines([DOC_V1])
+    v1_counts = counts()
+    # Keep v1 around so this worker can go back to it below
+    v1_lease = shared_index.acquire_lease(shared_dir, 1)
+
+    # As if another worker published v2 while this one was still on v1
+    ragpipelines.index_all_pipelines([DOC_V2])
+    ragpipelines._attach_shared(1)
+    shared_index.release_lease(v1_lease)
+    assert counts() == v1_counts
+
+    ragpipelines.sync_pipelines()
+    assert ragpipelines._attached_version == 2
+    assert "Dogs" in ragpipelines.PIPELINES[0].collection.get(limit=1)["documents"][0]
+
+
+def test_leased_version_survives_prune(shared_dir):
+    ragpipelines.index_all_pipelines([DOC_V1])
+    # Another worker still attached to v1
+    reader_lease = shared_index.acquire_lease(shared_dir, 1)
+
+    ragpipelines.index_all_pipelines([DOC_V2])
+    assert os.path.isdir(shared_index.version_dir(shared_dir, 1))
+
+    shared_index.release_lease(reader_lease)
+    ragpipelines.index_all_pipelines([DOC_V1])
+    assert shared_index.prune_versions(shared_dir, current=3) == []
+    assert not os.path.exists(shared_index.version_dir(shared_dir, 1))
+    assert not os.path.exists(shared_index.version_dir(shared_dir, 2))
+    assert os.path.isdir(shared_index.version_dir(shared_dir, 3))
+
+
+def test_failed_upload_keeps_previous_version(shared_dir, monkeypatch):
+    ragpipelines.index_all_pipelines([DOC_V1])
+    v1_counts = counts()
+
+    index_documents = RAGPipeline.index_documents
+
+    def failing_index_documents(self, raw_texts):
+        index_documents(self, raw_texts)
+        if self.pipeline_id == "C":
+            raise RuntimeError("embedding quota exceeded")
+
+    monkeypatch.setattr(RAGPipeline, "index_documents", failing_index_documents)
+    with pytest.raises(RuntimeError, match="quota"):
+        ragpipelines.index_all_pipelines([DOC_V2])
+
+    assert not os.path.exists(shared_index.version_dir(shared_dir, 2))
+    assert shared_index.read_version(shared_dir) == 1
+    assert ragpipelines._attached_version == 1
+    assert counts() == v1_counts
+    assert "Cats" in ragpipelines.PIPELINES[0].collection.get(limit=1)["documents"][0]
+
+
+def test_failed_first_upload_leaves_empty_index(shared_dir, monkeypatch):
+    def failing_index_documents(self, raw_texts):
+        raise RuntimeError("embedding quota exceeded")
+
+    monkeypatch.setattr(RAGPipeline, "index_documents", failing_index_documents)
+    with pytest.raises(RuntimeError):
+        ragpipelines.index_all_pipelines([DOC_V1])
+
+    assert not os.path.exists(shared_index.version_dir(shared_dir, 1))
+    assert ragpipelines._attached_version is None
+    assert counts() == [0, 0, 0, 0]
+
+
+def test_unreadable_version_keeps_serving_previous(shared_dir):
+    ragpipelines.index_all_pipelines([DOC_V1])
+    v1_counts = counts()
+
+    # A published version with no collections in it, e.g. damaged by hand
+    os.makedirs(shared_index.version_dir(shared_dir, 2))
+    shared_index.publish_version(shared_dir, 2)
+
+    ragpipelines.sync_pipelines()
+    assert ragpipelines._attached_version == 1
+    assert ragpipelines._broken_version == 2
+    assert counts() == v1_counts
+
+    # The new lease was released, so v2 is not held open by this worker
+    with open(os.path.join(shared_dir, "v2.lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
@@ -0,0 +1,75 @@
+import multiprocessing
+import os
+import time
+
+import backend_sharedindex as shared_index
+
+
+def _make_version(index_dir, version):
+    os.makedirs(shared_index.version_dir(index_dir, version))
+
+
+def test_publish_and_read_version(tmp_path):
+    index_dir = str(tmp_path)
+    assert shared_index.read_version(index_dir) == 0
+
+    shared_index.publish_version(index_dir, 1)
+    assert shared_index.read_version(index_dir) == 1
+    shared_index.publish_version(index_dir, 2)
+    assert shared_index.read_version(index_dir) == 2
+    assert sorted(os.listdir(index_dir)) == ["VERSION"]
+
+
+def test_prune_skips_leased_versions(tmp_path):
+    index_dir = str(tmp_path)
+    for version in (1, 2, 3):
+        _make_version(index_dir, version)
+
+    lease = shared_index.acquire_lease(index_dir, 1)
+    assert lease is not None
+
+    assert shared_index.prune_versions(index_dir, current=3) == [2]
+    assert os.path.isdir(shared_index.version_dir(index_dir, 1))
+    assert not os.path.exists(shared_index.version_dir(index_dir, 2))
+
+    shared_index.release_lease(lease)
+    assert shared_index.prune_versions(index_dir, current=3) == [1]
+    assert sorted(os.listdir(index_dir)) == ["v3"]
+
+
+def test_acquire_lease_on_pruned_version(tmp_path):
+    index_dir = str(tmp_path)
+    _make_version(index_dir, 1)
+    _make_version(index_dir, 2)
+    shared_index.prune_versions(index_dir, current=2)
+
+    assert shared_index.acquire_lease(index_dir, 1) is None
+    # The stray lease file is cleaned up by the next prune
+    shared_index.prune_versions(index_dir, current=2)
+    assert sorted(os.listdir(index_dir)) == ["v2"]
+
+
+def _hold_write_lock(index_dir, locked, log_path):
+    with shared_index.write_lock(index_dir):
+        locked.set()
+        time.sleep(0.3)
+        with open(log_path, "a") as f:
+            f.write("child done\n")
+
+
+def test_write_lock_serializes_processes(tmp_path):
+    index_dir = str(tmp_path / "index")
+    log_path = str(tmp_path / "log.txt")
+    locked = multiprocessing.Event()
+    child = multiprocessing.Process(target=_hold_write_lock, args=(index_dir, locked, log_path))
+    child.start()
+    try:
+        assert locked.wait(5)
+        with shared_index.write_lock(index_dir):
+            with open(log_path, "a") as f:
+                f.write("parent entered\n")
+    finally:
+        child.join(5)
+
+    with open(log_path) as f:
+        assert f.read().splitlines() == ["child done", "parent entered"]